@@ -1,106 +1,186 @@
+import asyncio
 import logging
-from typing import List
+import operator
+import re
+from typing import Callable, Dict, List, Optional
 
 from langchain.agents import AgentType, initialize_agent
-from langchain.memory import ConversationBufferMemory
-from langchain.prompts import PromptTemplate
-from langchain.tools import BaseTool, Tool
-from langchain_community.tools import TavilySearchResults
-from langchain_openai import ChatOpenAI
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.tools import BaseTool, Tool
 
-from agents.weather_agent import WeatherAgent
+from agents.weather_agent import WeatherAgent, find_city
+from config.config import config
+from tools.web_search_tool import get_web_search_tool
 from utils.llm_util import LLM_UTIL
+from utils.response_cache import ResponseCache
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared across agents so repeated questions skip the whole pipeline
+response_cache = ResponseCache(
+    ttl=config.RESPONSE_CACHE_TTL, sim_threshold=config.RESPONSE_CACHE_SIM_THRESHOLD
+)
+
+# Structured prompt template for the main agent
+_TEMPLATE = """
+    You are an intelligent AI assistant with access to specific tools. Your goal is to provide accurate and helpful responses using the most appropriate tool.
+
+    Available Tools:
+    {tools}
+
+    Previous conversation:
+    {chat_history}
+
+    Current Question: {input}
+
+    Follow these steps:
+    1. Analyze the question carefully
+    2. Select the most appropriate tool based on the question type
+    3. Use the tool ONCE to get information
+    4. Provide a clear and concise answer
+
+    Tool Selection Rules:
+    - Use weather_agent ONLY for weather-related queries
+    - Use web_search for all other queries, especially for:
+      * General knowledge questions
+      * News and current events
+      * Facts and information
+      * Research topics
+      * Learning concepts
+    - If unsure, default to web_search
+    - NEVER call the same tool multiple times for the same query
+
+    Provide only the final answer to the user's question. Do not include any intermediate thoughts or observations.
+    """
+
+_PROMPT = PromptTemplate.from_template(_TEMPLATE)
+
+_REVIEW_INSTRUCTIONS = """You are a weather response reviewer. Your task is to verify and enhance weather information responses.
+
+Review the response and provide a final, enhanced response that:
+1. Directly answers the original query
+2. Includes all necessary information (temperature, conditions, humidity, wind)
+3. Adds the current time in the local timezone
+4. Is clear and well-formatted
+5. Includes a brief source attribution
+
+Format your response as a single, concise paragraph. Do not include any analysis or numbered points.
+Current time should be in 24-hour format.
+
+Example format:
+"According to the latest weather data, [weather conditions] in [location] at [time]. Temperature is [temp]°C with [humidity]% humidity and [wind] km/h winds. Data provided by OpenWeatherMap."
+"""
+
+_REVIEW_INPUT = """Original Query: {original_query}
+Weather Response: {weather_response}"""
+
+# ReAct marker after which the agent's LLM output is the user-facing answer
+_FINAL_ANSWER_PREFIX = "Final Answer:"
+
 
 class ReviewAgent:
     def __init__(self, llm):
         self.llm = llm
-        self.prompt_template = PromptTemplate(
-            input_variables=["weather_response", "original_query"],
-            template="""
-            You are a weather response reviewer. Your task is to verify and enhance weather information responses.
-            
-            Original Query: {original_query}
-            Weather Response: {weather_response}
-            
-            Review the response and provide a final, enhanced response that:
-            1. Directly answers the original query
-            2. Includes all necessary information (temperature, conditions, humidity, wind)
-            3. Adds the current time in the local timezone
-            4. Is clear and well-formatted
-            5. Includes a brief source attribution
-            
-            Format your response as a single, concise paragraph. Do not include any analysis or numbered points.
-            Current time should be in 24-hour format.
-            
-            Example format:
-            "According to the latest weather data, [weather conditions] in [location] at [time]. Temperature is [temp]°C with [humidity]% humidity and [wind] km/h winds. Data provided by OpenWeatherMap."
-            """
+        # Static instructions lead (system message) and the per-query data
+        # trails (user message), so providers can cache the shared prefix
+        self.prompt_template = ChatPromptTemplate.from_messages(
+            [("system", _REVIEW_INSTRUCTIONS), ("user", _REVIEW_INPUT)]
         )
 
+    @staticmethod
+    def _clean_review(review) -> str:
+        """Keep only the final paragraph of the review"""
+        # Chat models return a message; completion models return the raw text,
+        # which may echo the "AI:" role label of the chat-formatted prompt
+        review = getattr(review, "content", review)
+        # Clean up the response to remove any analysis or numbered points
+        cleaned_response = review.strip().split("\n")[-1].strip()
+        if cleaned_response.startswith("AI:"):
+            cleaned_response = cleaned_response[len("AI:") :]
+        return cleaned_response.strip()
+
     def review_response(self, weather_response: str, original_query: str) -> str:
         """Review and enhance the weather agent's response"""
         try:
             # Get the review from the LLM
-            review_prompt = self.prompt_template.format(
+            review_prompt = self.prompt_template.format_messages(
                 weather_response=weather_response, original_query=original_query
             )
             
             review = self.llm.invoke(review_prompt)
-            # Clean up the response to remove any analysis or numbered points
-            cleaned_response = review.split('\n')[-1] if '\n' in review else review
-            return cleaned_response.strip()
+            return self._clean_review(review)
         except Exception as e:
-            logger.error(f"Error in review agent: {str(e)}")
+            logger.error("Error in review agent: %s", e)
             return weather_response  # Return original response if review fails
 
+    async def areview_response(self, weather_response: str, original_query: str) -> str:
+        """Async variant of review_response"""
+        try:
+            review_prompt = self.prompt_template.format_messages(
+                weather_response=weather_response, original_query=original_query
+            )
+
+            review = await self.llm.ainvoke(review_prompt)
+            return self._clean_review(review)
+        except Exception as e:
+            logger.error("Error in review agent: %s", e)
+            return weather_response
+
 
 class ToolSelector:
+    # Word boundaries keep e.g. "rainbow" from counting as a weather query
+    _weather_re = re.compile(
+        r"\b(weather|temperatures?|forecasts?|rain(?:y|ing)?|snow(?:y|ing)?|humidity)\b",
+        re.IGNORECASE,
+    )
+
     def __init__(self, tools: List[BaseTool]):
         self.tools = tools
         self.tool_descriptions = {tool.name: tool.description for tool in tools}
-        # Initialize the LLM for routing
-        self.router_llm = ChatOpenAI(temperature=0)
-        # Initialize the agent with the tools
-        self.router_agent = initialize_agent(
-            tools,
-            self.router_llm,
-            agent=AgentType.OPENAI_FUNCTIONS,
-            verbose=False  # Set verbose to False to remove observation logs
-        )
+
+    def get_tool(self, name: str) -> BaseTool:
+        """Return the tool registered under the given name"""
+        for tool in self.tools:
+            if tool.name == name:
+                return tool
+        raise KeyError(f"Unknown tool: {name}")
 
     def select_tool(self, query: str) -> str:
-        """Select the most appropriate tool based on the query using LangChain's agent-based routing."""
-        try:
-            # Use the agent to determine which tool to use
-            result = self.router_agent.invoke({"input": query})
-            # Extract the selected tool name from the result
-            selected_tool = result.get("output", "web_search")  # Default to web_search if no clear selection
-            return selected_tool
-        except Exception as e:
-            logger.error(f"Error in tool selection: {e}")
-            return "web_search"  # Fallback to web search on error
+        """Select the most appropriate tool based on weather keywords in the query"""
+        return "weather_agent" if self._weather_re.search(query) else "web_search"
 
 
-def create_hybrid_agent(verbose=False):
-    llm = LLM_UTIL.get_llm()
-    weather_agent = WeatherAgent(llm)
+def create_hybrid_agent(verbose=False, llm=None, weather_agent=None, use_memory=True):
+    # Reuse the caller's LLM client (and its connection pool) when given
+    if llm is None:
+        llm = LLM_UTIL.get_llm()
+    if weather_agent is None:
+        weather_agent = WeatherAgent(llm)
     review_agent = ReviewAgent(llm)
+    # Built on first use (not at import) so a missing TAVILY_API_KEY is reported
+    # by the caller; get_web_search_tool returns the same instance every time
+    web_search = get_web_search_tool()
 
-    # Initialize conversation memory
-    memory = ConversationBufferMemory(
-        memory_key="chat_history", return_messages=True, output_key="output"
-    )
+    # Initialize conversation memory, keeping only the most recent turns so it
+    # cannot grow without bound. The ReAct prompt from initialize_agent does not
+    # read chat_history, so the memory must never cost an LLM call of its own.
+    # Callers answering unrelated prompts (batch mode) opt out of memory entirely
+    memory = None
+    if use_memory:
+        memory = ConversationBufferWindowMemory(
+            k=config.MEMORY_WINDOW_TURNS,
+            memory_key="chat_history",
+            return_messages=True,
+            output_key="output",
+        )
 
     # Define the tools with more specific descriptions
     tools = [
         Tool(
             name="web_search",
-            func=TavilySearchResults().run,
+            func=web_search.run,
+            coroutine=web_search.arun,
             description="""Use this tool for:
             - General knowledge questions
             - News and current events
@@ -112,6 +192,7 @@ def create_hybrid_agent(verbose=False):
         Tool(
             name="weather_agent",
             func=weather_agent.invoke,
+            coroutine=weather_agent.ainvoke,
             description="""Use this tool for:
             - Current weather conditions
             - Weather forecasts
@@ -124,52 +205,18 @@ def create_hybrid_agent(verbose=False):
     # Create tool selector
     tool_selector = ToolSelector(tools)
 
-    # Create a more structured prompt template
-    template = """
-    You are an intelligent AI assistant with access to specific tools. Your goal is to provide accurate and helpful responses using the most appropriate tool.
-
-    Available Tools:
-    {tools}
-
-    Previous conversation:
-    {chat_history}
-
-    Current Question: {input}
-
-    Follow these steps:
-    1. Analyze the question carefully
-    2. Select the most appropriate tool based on the question type
-    3. Use the tool ONCE to get information
-    4. Provide a clear and concise answer
-
-    Tool Selection Rules:
-    - Use weather_agent ONLY for weather-related queries
-    - Use web_search for all other queries, especially for:
-      * General knowledge questions
-      * News and current events
-      * Facts and information
-      * Research topics
-      * Learning concepts
-    - If unsure, default to web_search
-    - NEVER call the same tool multiple times for the same query
-
-    Provide only the final answer to the user's question. Do not include any intermediate thoughts or observations.
-    """
-
-    prompt = PromptTemplate.from_template(template)
-
     # Initialize the agent with memory and custom prompt
     agent = initialize_agent(
         tools=tools,
         llm=llm,
         agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-        verbose=False,  # Set verbose to False to remove observation logs
+        verbose=verbose,
         handle_parsing_errors=True,
         max_iterations=2,
         early_stopping_method="generate",
         memory=memory,
         return_intermediate_steps=True,
-        prompt=prompt,
+        prompt=_PROMPT,
     )
 
     return agent, tool_selector, review_agent
@@ -179,75 +226,178 @@ def route_query(query: str, agent, tool_selector, review_agent):
     """
     Route the query to the appropriate agent or tool with improved error handling
     """
+    return asyncio.run(aroute_query(query, agent, tool_selector, review_agent))
+
+
+async def aroute_query(
+    query: str,
+    agent,
+    tool_selector,
+    review_agent,
+    on_token: Optional[Callable[[str], None]] = None,
+    on_status: Optional[Callable[[str], None]] = None,
+):
+    """
+    Async variant of route_query. When on_token is given, the agent's final
+    answer is streamed to it as it is generated; on_status receives short
+    progress markers while tools run. Weather queries bypass the agent and
+    their reviewed answer is returned whole rather than streamed.
+    """
     try:
-        logger.info(f"Processing query: {query}")
-        
+        logger.info("Processing query: %s", query)
+
+        # Scope cached answers by city so they are never served for another location
+        cache_scope = find_city(query) or ""
+        cached_response = await response_cache.aget(query, cache_scope)
+        if cached_response is not None:
+            logger.info("Serving cached response")
+            return cached_response
+
         # Get tool recommendation
         recommended_tool = tool_selector.select_tool(query)
-        logger.info(f"Recommended tool: {recommended_tool}")
-        
+        logger.info("Recommended tool: %s", recommended_tool)
+
+        if recommended_tool == "weather_agent":
+            # The selector matched weather keywords, so skip the ReAct round and
+            # call the weather tool directly, then have the review agent check it.
+            # A failed lookup raises, so only real answers reach the cache below
+            if on_status is not None:
+                on_status("(searching…)")
+            weather_response = await tool_selector.get_tool("weather_agent").ainvoke(
+                query
+            )
+            final_response = await review_agent.areview_response(
+                weather_response, query
+            )
+            if agent.memory is not None:
+                await agent.memory.asave_context(
+                    {"input": query}, {"output": final_response}
+                )
+            logger.info("Query processed successfully")
+            await response_cache.aset(
+                query,
+                final_response,
+                scope=cache_scope,
+                ttl=config.WEATHER_RESPONSE_CACHE_TTL,
+            )
+            return final_response
+
         # Process the query
-        response = agent.invoke({"input": query})
-        
-        logger.info(f"Query processed successfully")
-
-        # Extract the final answer from the response
-        if isinstance(response, dict):
-            if "output" in response:
-                final_response = response["output"]
-            elif "intermediate_steps" in response and response["intermediate_steps"]:
-                # Get the last step's output
-                last_step = response["intermediate_steps"][-1]
-                if isinstance(last_step, tuple) and len(last_step) > 1:
-                    # If the last step is an action, execute it
-                    if isinstance(last_step[0], dict) and "action" in last_step[0]:
-                        tool_name = last_step[0]["action"]
-                        tool_input = last_step[0]["action_input"]
-                        for tool in agent.tools:
-                            if tool.name == tool_name:
-                                try:
-                                    final_response = tool.func(tool_input)
-                                    # If it's a web search, format the response
-                                    if tool_name == "web_search":
-                                        final_response = format_web_search_response(final_response)
-                                except Exception as e:
-                                    logger.error(f"Error executing tool {tool_name}: {str(e)}")
-                                    final_response = f"Sorry, I encountered an error while searching: {str(e)}"
-                                break
-                    else:
-                        final_response = last_step[1]  # Return the observation
-            elif "input" in response and "output" in response:
-                final_response = response["output"]
-            else:
-                final_response = str(response)
+        if on_token is not None or on_status is not None:
+            response = await _astream_agent(agent, query, on_token, on_status)
         else:
-            final_response = str(response)
+            response = await agent.ainvoke({"input": query})
+        logger.info("Query processed successfully")
 
-        # If this was a weather query, have the review agent check the response
-        if recommended_tool == "weather_agent":
-            final_response = review_agent.review_response(final_response, query)
+        final_response = _extract_final_response(response, agent)
+        await response_cache.aset(query, final_response, scope=cache_scope)
 
         return final_response
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
+        logger.error("Error processing query: %s", e)
         return f"An error occurred while processing your query: {str(e)}"
 
 
+async def _astream_agent(
+    agent,
+    query: str,
+    on_token: Optional[Callable[[str], None]],
+    on_status: Optional[Callable[[str], None]],
+):
+    """Run the agent via astream_events, forwarding tokens after "Final Answer:" """
+    output = None
+    pending: Dict[str, str] = {}  # LLM run id -> text seen before the answer prefix
+    answering: Dict[str, bool] = {}  # LLM run id -> whether answer text was emitted
+
+    async for event in agent.astream_events({"input": query}, version="v2"):
+        kind = event["event"]
+        if kind in ("on_llm_stream", "on_chat_model_stream") and on_token is not None:
+            chunk = event["data"]["chunk"]
+            text = chunk.content if hasattr(chunk, "content") else chunk.text
+            run_id = event["run_id"]
+            if run_id not in answering:
+                buffered = pending.get(run_id, "") + text
+                _, prefix, text = buffered.partition(_FINAL_ANSWER_PREFIX)
+                if not prefix:
+                    pending[run_id] = buffered
+                    continue
+                pending.pop(run_id, None)
+                answering[run_id] = False
+            if not answering[run_id]:
+                text = text.lstrip()
+            if text:
+                answering[run_id] = True
+                on_token(text)
+        elif kind == "on_tool_start" and on_status is not None:
+            on_status("(searching…)")
+        elif kind == "on_chain_end" and not event["parent_ids"]:
+            output = event["data"]["output"]
+
+    if output is None:
+        raise RuntimeError("Agent finished without producing an output")
+    return output
+
+
+def _extract_final_response(response, agent):
+    """Extract the final answer from the agent response"""
+    if isinstance(response, dict):
+        if "output" in response:
+            final_response = response["output"]
+        elif "intermediate_steps" in response and response["intermediate_steps"]:
+            # Get the last step's output
+            last_step = response["intermediate_steps"][-1]
+            if isinstance(last_step, tuple) and len(last_step) > 1:
+                # If the last step is an action, execute it
+                if isinstance(last_step[0], dict) and "action" in last_step[0]:
+                    tool_name = last_step[0]["action"]
+                    tool_input = last_step[0]["action_input"]
+                    for tool in agent.tools:
+                        if tool.name == tool_name:
+                            # Errors propagate so that aroute_query never caches them
+                            final_response = tool.func(tool_input)
+                            # If it's a web search, format the response
+                            if tool_name == "web_search":
+                                final_response = format_web_search_response(
+                                    final_response
+                                )
+                            break
+                else:
+                    final_response = last_step[1]  # Return the observation
+        elif "input" in response and "output" in response:
+            final_response = response["output"]
+        else:
+            final_response = str(response)
+    else:
+        final_response = str(response)
+    return final_response
+
+
+_WEB_RESULT_DEFAULTS = {"title": "No title", "snippet": "No description"}
+_get_title_snippet = operator.itemgetter("title", "snippet")
+
+
+def _format_web_results(results: list) -> str:
+    """Format multiple web search results"""
+    parts = ["Here's what I found:\n\n"]
+    for i, result in enumerate(results[:3], 1):  # Limit to top 3 results
+        title, snippet = _get_title_snippet({**_WEB_RESULT_DEFAULTS, **result})
+        parts.append(f"{i}. {title}\n   {snippet}\n\n")
+    return "".join(parts).strip()
+
+
+def _format_web_result(result: dict) -> str:
+    """Format a single web search result"""
+    title, snippet = _get_title_snippet({**_WEB_RESULT_DEFAULTS, **result})
+    return f"{title}\n{snippet}"
+
+
+_WEB_SEARCH_FORMATTERS = {list: _format_web_results, dict: _format_web_result}
+
+
 def format_web_search_response(response):
     """Format web search results into a readable response"""
     try:
-        if isinstance(response, list):
-            # Format multiple results
-            formatted_response = "Here's what I found:\n\n"
-            for i, result in enumerate(response[:3], 1):  # Limit to top 3 results
-                formatted_response += f"{i}. {result.get('title', 'No title')}\n"
-                formatted_response += f"   {result.get('snippet', 'No description')}\n\n"
-            return formatted_response.strip()
-        elif isinstance(response, dict):
-            # Format single result
-            return f"{response.get('title', 'No title')}\n{response.get('snippet', 'No description')}"
-        else:
-            return str(response)
+        return _WEB_SEARCH_FORMATTERS.get(type(response), str)(response)
     except Exception as e:
-        logger.error(f"Error formatting web search response: {str(e)}")
+        logger.error("Error formatting web search response: %s", e)
         return str(response)
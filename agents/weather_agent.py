@@ -1,13 +1,78 @@
+import asyncio
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional, Tuple
 
 from langchain.agents import AgentType, initialize_agent
 from langchain.chains.llm import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain.tools import Tool
+from langchain_core.prompts import PromptTemplate
+from langchain_core.tools import Tool
 
 from tools.weather_tool import WeatherData, WeatherTool
 
+# List of major cities in Pakistan
+PAKISTANI_CITIES = [
+    "Islamabad",
+    "Lahore",
+    "Karachi",
+    "Peshawar",
+    "Quetta",
+    "Rawalpindi",
+    "Multan",
+    "Faisalabad",
+    "Hyderabad",
+    "Gujranwala",
+]
+
+
+# Compiled once so matching a query is a single pass over the string
+_CITY_BY_LOWER = {city.lower(): city for city in PAKISTANI_CITIES}
+_CITY_RE = re.compile("|".join(map(re.escape, _CITY_BY_LOWER)), re.IGNORECASE)
+
+
+@dataclass(slots=True, frozen=True)
+class TravelImpact:
+    road_conditions: str = "Normal"
+    flight_impact: str = "Normal"
+    public_transport: str = "Normal"
+
+
+@dataclass(slots=True, frozen=True)
+class Recommendations:
+    outdoor_activities: Tuple[str, ...]
+    health_alerts: Tuple[str, ...]
+    clothing_recommendations: Tuple[str, ...]
+    travel_impact: TravelImpact
+
+
+# Temperature bands (°C): below 0, 0 to <15, 15 to 25 inclusive, above 25
+_BAND_LOWER_BOUNDS = (0, 15)
+_OUTDOOR_BY_BAND = (
+    "Consider indoor activities or dress warmly for outdoor activities",
+    "Consider indoor activities or dress warmly for outdoor activities",
+    "Perfect for hiking or outdoor sports",
+    "Great day for swimming or beach activities",
+)
+_CLOTHING_BY_BAND = (
+    "Heavy winter clothing required",
+    "Warm clothing recommended",
+    "Light to medium clothing appropriate",
+    "Light clothing recommended",
+)
+
+
+def _temperature_band(temperature: float) -> int:
+    """Index into the *_BY_BAND tables for a temperature"""
+    return bisect_right(_BAND_LOWER_BOUNDS, temperature) + (temperature > 25)
+
+
+def find_city(query: str) -> Optional[str]:
+    """Return the first known city named in the query, if any"""
+    match = _CITY_RE.search(query)
+    return _CITY_BY_LOWER[match.group().lower()] if match else None
+
 
 class WeatherAgent:
     def __init__(self, llm):
@@ -19,21 +84,24 @@ class WeatherAgent:
             Tool(
                 name="get_current_weather",
                 func=self.weather_tool.get_current_weather,
+                coroutine=self.weather_tool.aget_current_weather,
                 description="Get current weather data for a specific location",
             ),
             Tool(
                 name="get_weather_forecast",
-                func=self.weather_tool.get_weather_forecast,
-                description="Get weather forecast for the next few days",
+                func=self.weather_tool.get_daily_forecast,
+                description="Get per-day temperature range and conditions for the next few days; 'samples' is the number of 3-hourly readings behind each day (8 for a full day, fewer for partial days)",
             ),
             Tool(
                 name="get_air_quality",
                 func=self.weather_tool.get_air_quality,
+                coroutine=self.weather_tool.aget_air_quality,
                 description="Get current air quality data for a location",
             ),
             Tool(
                 name="get_historical_air_quality",
                 func=self.weather_tool.get_historical_air_quality,
+                coroutine=self.weather_tool.aget_historical_air_quality,
                 description="Get historical air quality data for a location over the past week",
             ),
             Tool(
@@ -71,117 +139,108 @@ class WeatherAgent:
         )
 
     def invoke(self, query: str) -> str:
-        """Process a weather-related query using AI-driven analysis"""
-        try:
-            # Extract location from query
-            location = self._extract_location(query)
-            if not location:
-                return "I couldn't determine the location from your query. Please specify a location name."
-
-            # Get current weather data
-            current_weather = self.weather_tool.get_current_weather(location)
+        """Process a weather-related query; lookup failures are raised to the caller"""
+        # Extract location from query
+        location = self._extract_location(query)
+        if not location:
+            raise ValueError(
+                "I couldn't determine the location from your query. Please specify a location name."
+            )
 
-            # Get air quality data
-            try:
-                air_quality = self.weather_tool.get_air_quality(location)
-                aqi = air_quality["aqi"]
-                smog_level = air_quality["components"].get("pm2_5", 0)  # PM2.5 as smog level
-            except Exception:
-                aqi = "N/A"
-                smog_level = "N/A"
+        # Get current weather data
+        current_weather = self.weather_tool.get_current_weather(location)
 
-            # Get current time
-            current_time = datetime.now().strftime("%H:%M")
+        # Get air quality data
+        try:
+            air_quality = self.weather_tool.get_air_quality(location)
+        except Exception:
+            air_quality = None
+
+        return self._format_response(location, current_weather, air_quality)
+
+    async def ainvoke(self, query: str) -> str:
+        """Async variant of invoke; weather and air quality are fetched concurrently"""
+        location = self._extract_location(query)
+        if not location:
+            raise ValueError(
+                "I couldn't determine the location from your query. Please specify a location name."
+            )
 
-            # Format the response with all available data
-            response = f"According to the latest weather data, the current air quality index (AQI) in {location} is {aqi} and the smog level is {smog_level}. As of {current_time}, the weather conditions in {location} are {current_weather.description} with a temperature of {current_weather.temperature}°C, humidity of {current_weather.humidity}%, and wind speed of {current_weather.wind_speed} km/h. This information is provided by OpenWeatherMap."
+        current_weather, air_quality = await asyncio.gather(
+            self.weather_tool.aget_current_weather(location),
+            self.weather_tool.aget_air_quality(location),
+            return_exceptions=True,
+        )
+        if isinstance(current_weather, Exception):
+            raise current_weather
+        if isinstance(air_quality, Exception):
+            air_quality = None
+
+        return self._format_response(location, current_weather, air_quality)
+
+    def _format_response(
+        self,
+        location: str,
+        current_weather: WeatherData,
+        air_quality: Optional[Dict[str, Any]],
+    ) -> str:
+        """Format weather and air quality data (None if unavailable) as a reply"""
+        try:
+            aqi = air_quality["aqi"]
+            smog_level = air_quality["components"].get("pm2_5", 0)  # PM2.5 as smog level
+        except Exception:
+            aqi = "N/A"
+            smog_level = "N/A"
 
-            return response
+        # Get current time
+        current_time = datetime.now().strftime("%H:%M")
 
-        except Exception as e:
-            return f"Sorry, I encountered an error: {str(e)}. Please try rephrasing your question."
+        # Format the response with all available data
+        return f"According to the latest weather data, the current air quality index (AQI) in {location} is {aqi} and the smog level is {smog_level}. As of {current_time}, the weather conditions in {location} are {current_weather.description} with a temperature of {current_weather.temperature}°C, humidity of {current_weather.humidity}%, and wind speed of {current_weather.wind_speed} km/h. This information is provided by OpenWeatherMap."
 
     def _extract_location(self, query: str) -> str:
         """Extract location from the query"""
-        # Convert query to lowercase for case-insensitive matching
-        query_lower = query.lower()
-
-        # List of major cities in Pakistan
-        pakistani_cities = [
-            "Islamabad",
-            "Lahore",
-            "Karachi",
-            "Peshawar",
-            "Quetta",
-            "Rawalpindi",
-            "Multan",
-            "Faisalabad",
-            "Hyderabad",
-            "Gujranwala",
-        ]
-
-        # Try to find exact city names
-        for city in pakistani_cities:
-            if city.lower() in query_lower:
-                return city
-
-        # If no exact match, try to find location keywords
-        location_keywords = ["in", "at", "for", "to", "around", "near"]
-        words = query_lower.split()
-
-        for i, word in enumerate(words):
-            if word in location_keywords and i + 1 < len(words):
-                # Get the next word as potential location
-                potential_location = words[i + 1].capitalize()
-                # Check if it's a known city
-                if potential_location in [city.lower() for city in pakistani_cities]:
-                    return potential_location.capitalize()
+        city = find_city(query)
+        if city:
+            return city
 
         # Default to Islamabad if no location is specified
         return "Islamabad"
 
-    def get_weather_recommendations(self, location: str) -> Dict[str, Any]:
+    def get_weather_recommendations(self, location: str) -> Recommendations:
         """Get personalized weather recommendations based on current conditions"""
-        current_weather = self.weather_tool.get_current_weather(location)
-        air_quality = self.weather_tool.get_air_quality(location)
+        bundle = self.weather_tool.get_bundle(location)
+        current_weather, air_quality = bundle["current"], bundle["air_quality"]
+        has_rain = "rain" in current_weather.description.lower()
 
-        recommendations = {
-            "outdoor_activities": self._get_outdoor_activity_recommendations(
-                current_weather
+        return Recommendations(
+            outdoor_activities=self._get_outdoor_activity_recommendations(
+                current_weather, has_rain
             ),
-            "health_alerts": self._get_health_alerts(current_weather, air_quality),
-            "clothing_recommendations": self._get_clothing_recommendations(
-                current_weather
+            health_alerts=self._get_health_alerts(current_weather, air_quality),
+            clothing_recommendations=self._get_clothing_recommendations(
+                current_weather, has_rain
             ),
-            "travel_impact": self._get_travel_impact(current_weather),
-        }
-
-        return recommendations
+            travel_impact=self._get_travel_impact(current_weather, has_rain),
+        )
 
-    def _get_outdoor_activity_recommendations(self, weather: WeatherData) -> List[str]:
+    def _get_outdoor_activity_recommendations(
+        self, weather: WeatherData, has_rain: bool
+    ) -> Tuple[str, ...]:
         """Get recommendations for outdoor activities based on weather conditions"""
-        recommendations = []
-
-        if weather.temperature > 25:
-            recommendations.append("Great day for swimming or beach activities")
-        elif 15 <= weather.temperature <= 25:
-            recommendations.append("Perfect for hiking or outdoor sports")
-        elif weather.temperature < 15:
-            recommendations.append(
-                "Consider indoor activities or dress warmly for outdoor activities"
-            )
+        recommendations = (_OUTDOOR_BY_BAND[_temperature_band(weather.temperature)],)
 
         if weather.wind_speed > 20:
-            recommendations.append("High winds - avoid activities that require balance")
+            recommendations += ("High winds - avoid activities that require balance",)
 
-        if "rain" in weather.description.lower():
-            recommendations.append("Rain expected - consider indoor activities")
+        if has_rain:
+            recommendations += ("Rain expected - consider indoor activities",)
 
         return recommendations
 
     def _get_health_alerts(
         self, weather: WeatherData, air_quality: Dict[str, Any]
-    ) -> List[str]:
+    ) -> Tuple[str, ...]:
         """Get health-related alerts based on weather and air quality"""
         alerts = []
 
@@ -203,48 +262,35 @@ class WeatherAgent:
         if weather.temperature < 0:
             alerts.append("Freezing temperatures - dress warmly and watch for ice")
 
-        return alerts
+        return tuple(alerts)
 
-    def _get_clothing_recommendations(self, weather: WeatherData) -> List[str]:
+    def _get_clothing_recommendations(
+        self, weather: WeatherData, has_rain: bool
+    ) -> Tuple[str, ...]:
         """Get clothing recommendations based on weather conditions"""
-        recommendations = []
+        recommendations = (_CLOTHING_BY_BAND[_temperature_band(weather.temperature)],)
 
-        if weather.temperature > 25:
-            recommendations.append("Light clothing recommended")
-        elif 15 <= weather.temperature <= 25:
-            recommendations.append("Light to medium clothing appropriate")
-        elif 0 <= weather.temperature < 15:
-            recommendations.append("Warm clothing recommended")
-        else:
-            recommendations.append("Heavy winter clothing required")
-
-        if "rain" in weather.description.lower():
-            recommendations.append("Bring rain gear or umbrella")
+        if has_rain:
+            recommendations += ("Bring rain gear or umbrella",)
 
         if weather.wind_speed > 15:
-            recommendations.append(
-                "Windy conditions - consider wind-resistant clothing"
-            )
+            recommendations += ("Windy conditions - consider wind-resistant clothing",)
 
         return recommendations
 
-    def _get_travel_impact(self, weather: WeatherData) -> Dict[str, Any]:
+    def _get_travel_impact(self, weather: WeatherData, has_rain: bool) -> TravelImpact:
         """Get travel impact analysis based on weather conditions"""
-        impact = {
-            "road_conditions": "Normal",
-            "flight_impact": "Normal",
-            "public_transport": "Normal",
-        }
+        road_conditions = flight_impact = public_transport = "Normal"
 
-        if "rain" in weather.description.lower():
-            impact["road_conditions"] = "Wet roads - allow extra travel time"
-            impact["flight_impact"] = "Possible delays due to rain"
+        if has_rain:
+            road_conditions = "Wet roads - allow extra travel time"
+            flight_impact = "Possible delays due to rain"
 
         if weather.wind_speed > 30:
-            impact["flight_impact"] = "Possible delays due to high winds"
+            flight_impact = "Possible delays due to high winds"
 
         if weather.temperature < 0:
-            impact["road_conditions"] = "Possible ice - drive with caution"
-            impact["public_transport"] = "Possible delays due to cold weather"
+            road_conditions = "Possible ice - drive with caution"
+            public_transport = "Possible delays due to cold weather"
 
-        return impact
+        return TravelImpact(road_conditions, flight_impact, public_transport)
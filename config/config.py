@@ -8,6 +8,15 @@ dotenv.load_dotenv()
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     TEMPERATURE = 0
+    # Response cache: default TTL, shorter TTL for weather answers (seconds)
+    RESPONSE_CACHE_TTL = 600
+    WEATHER_RESPONSE_CACHE_TTL = 300
+    RESPONSE_CACHE_SIM_THRESHOLD = 0.92
+    # Maximum prompts in flight in batch mode (match the providers' rate limits);
+    # kept as a string so main's argument parser validates it like --concurrency
+    AGENT_CONCURRENCY = os.getenv("HYBRID_AGENT_CONCURRENCY", "16")
+    # Number of recent conversation turns kept in the agent's memory
+    MEMORY_WINDOW_TURNS = 10
 
 
 config = Config()
@@ -1,21 +1,29 @@
+import argparse
+import asyncio
+import logging
 import sys
-from typing import Tuple
+import threading
+from typing import List, Tuple
 
-from agents.agent import create_hybrid_agent, route_query
+from agents.agent import aroute_query, create_hybrid_agent
 from agents.weather_agent import WeatherAgent
+from config.config import config
 from utils.cli_formatter import formatCLI
 from utils.command_handler import CommandHandler
 from utils.llm_util import LLM_UTIL
 
 
 class WeatherApp:
-    def __init__(self):
+    def __init__(self, use_memory: bool = True):
         self.llm = LLM_UTIL.get_llm()
         self.weather_agent = WeatherAgent(self.llm)
         self.command_handler = CommandHandler(self.weather_agent)
-        # Initialize the agent, tool selector, and review agent
+        # Initialize the agent, tool selector, and review agent on the shared LLM
         self.agent, self.tool_selector, self.review_agent = create_hybrid_agent(
-            verbose=True
+            verbose=False,
+            llm=self.llm,
+            weather_agent=self.weather_agent,
+            use_memory=use_memory,
         )
 
     def setup(self) -> None:
@@ -36,11 +44,39 @@ class WeatherApp:
         args = parts[1:]
         return command, args
 
-    def run(self) -> None:
+    async def _ainput(self, prompt: str) -> str:
+        """Read a line from stdin without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def _resolve(result=None, error=None) -> None:
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def _read() -> None:
+            try:
+                line = input(prompt)
+            except Exception as e:
+                loop.call_soon_threadsafe(_resolve, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, line)
+
+        # A daemon thread (rather than the default executor) so that Ctrl+C
+        # does not leave interpreter shutdown waiting on a blocked input()
+        threading.Thread(target=_read, daemon=True).start()
+        return await future
+
+    async def arun(self) -> None:
         """Run the main application loop"""
         while True:
+            # Everything printed after the response is flushed in a single write
+            output = ""
             try:
-                user_input = input(formatCLI.format_user_input(""))
+                user_input = await self._ainput(formatCLI.format_user_input(""))
                 command, args = self._parse_input(user_input)
 
                 if command in {"exit", "quit"}:
@@ -48,24 +84,96 @@ class WeatherApp:
                     break
 
                 formatCLI.print_thinking()
+                streamed = []
+
+                def _on_token(token: str) -> None:
+                    chunk = token if streamed else formatCLI.format_agent_output(token)
+                    streamed.append(token)
+                    sys.stdout.write(chunk)
+                    sys.stdout.flush()
+
                 # Use the pre-initialized agent, tool selector, and review agent
-                response = route_query(
-                    user_input, self.agent, self.tool_selector, self.review_agent
+                response = await aroute_query(
+                    user_input,
+                    self.agent,
+                    self.tool_selector,
+                    self.review_agent,
+                    on_token=_on_token,
+                    on_status=formatCLI.print_status,
                 )
-                print(formatCLI.format_agent_output(response))
+                if streamed:
+                    output = "\n"
+                else:
+                    output = formatCLI.format_agent_output(response) + "\n"
 
             except Exception as e:
                 formatCLI.print_error(str(e))
 
-            formatCLI.print_divider()
+            sys.stdout.write(output + formatCLI.format_divider() + "\n")
+            sys.stdout.flush()
+
+        await self.weather_agent.weather_tool.aclose()
+
+    async def arun_batch(self, prompts: List[str], concurrency: int) -> List[str]:
+        """Answer all prompts concurrently, with at most `concurrency` in flight"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _bounded(prompt: str) -> str:
+            async with semaphore:
+                return await aroute_query(
+                    prompt, self.agent, self.tool_selector, self.review_agent
+                )
+
+        try:
+            return await asyncio.gather(*(_bounded(prompt) for prompt in prompts))
+        finally:
+            await self.weather_agent.weather_tool.aclose()
+
+
+def _parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="LangChain CLI Assistant")
+    parser.add_argument(
+        "--batch-file",
+        help="answer every prompt in this file (one per line) and exit",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=config.AGENT_CONCURRENCY,
+        help="maximum number of prompts processed at once in batch mode "
+        "(default: $HYBRID_AGENT_CONCURRENCY or 16)",
+    )
+    return parser.parse_args()
+
+
+def _run_batch(app: WeatherApp, path: str, concurrency: int) -> None:
+    """Answer the prompts in a file and print the results in order"""
+    with open(path, encoding="utf-8") as f:
+        prompts = [line.strip() for line in f if line.strip()]
+
+    responses = asyncio.run(app.arun_batch(prompts, concurrency))
+    for prompt, response in zip(prompts, responses):
+        print(formatCLI.format_user_input(prompt))
+        print(formatCLI.format_agent_output(response))
+        formatCLI.print_divider()
 
 
 def main() -> int:
     """Main entry point for the application"""
+    logging.basicConfig(level=logging.INFO)
+    args = _parse_args()
+    if args.concurrency < 1:
+        formatCLI.print_error("--concurrency must be at least 1")
+        return 1
     try:
-        app = WeatherApp()
+        # Batch prompts are independent and would race on a shared memory
+        app = WeatherApp(use_memory=not args.batch_file)
+        if args.batch_file:
+            _run_batch(app, args.batch_file, args.concurrency)
+            return 0
         app.setup()
-        app.run()
+        asyncio.run(app.arun())
         return 0
     except KeyboardInterrupt:
         print("\nGoodbye!")
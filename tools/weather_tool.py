@@ -1,12 +1,30 @@
+import asyncio
+import hashlib
+import operator
 import os
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from itertools import groupby, islice
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+import diskcache
+import httpx
 import requests
+from cachetools import LRUCache, TTLCache, cachedmethod
+from cachetools.keys import hashkey
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class WeatherData:
     temperature: float
     feels_like: float
@@ -20,6 +38,31 @@ class WeatherData:
     air_quality: Optional[int] = None
 
 
+# How long (seconds) raw API responses are reused from the disk cache
+_RESPONSE_TTLS = {
+    "weather": 10 * 60,
+    "forecast": 60 * 60,
+    "air_pollution": 60 * 60,
+    "air_pollution/history": 24 * 60 * 60,
+    "uvi": 60 * 60,
+    "geo/1.0/direct": 7 * 24 * 60 * 60,
+}
+
+# Coordinate probes in flight at once. The next spelling is only sent when an
+# earlier one misses, so a cold lookup of a valid name costs two requests
+_PROBE_CONCURRENCY = 2
+
+
+def ttl_for(endpoint: str) -> int:
+    """Disk cache TTL for an endpoint's responses"""
+    return _RESPONSE_TTLS.get(endpoint, 10 * 60)
+
+
+def _location_key(self, location: str, *args, **kwargs):
+    """Cache key that treats differently cased/padded location names as one"""
+    return hashkey(location.strip().lower(), *args, **kwargs)
+
+
 class WeatherTool:
     def __init__(self):
         self.api_key = os.getenv("OPENWEATHERMAP_API_KEY")
@@ -27,58 +70,271 @@ class WeatherTool:
             raise ValueError("OPENWEATHERMAP_API_KEY environment variable is not set")
         self.base_url = "http://api.openweathermap.org/data/2.5"
 
+        # Short-lived per-endpoint caches (TTL in seconds matches how fast the data changes)
+        self._cache_lock = threading.Lock()
+        self._current_cache = TTLCache(maxsize=128, ttl=120)
+        self._forecast_cache = TTLCache(maxsize=64, ttl=300)
+        self._air_quality_cache = TTLCache(maxsize=128, ttl=300)
+        self._uv_cache = TTLCache(maxsize=128, ttl=300)
+        # Coordinates do not change, so geocoding results are kept for the session
+        self._geo_cache = LRUCache(maxsize=4096)
+        # (endpoint, spelling) probes that found no match, skipped from then on
+        self._known_bad: Set[Tuple[str, str]] = set()
+        # Raw responses persisted across runs
+        self._disk_cache = diskcache.Cache(
+            os.path.expanduser(os.getenv("WEATHER_CACHE_DIR", "~/.cache/weather_tool"))
+        )
+
+        # Pooled keep-alive session for the sync methods, retrying transient errors
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=50,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+            ),
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        # Shared keep-alive client for the async methods, created on first use
+        # inside the running event loop
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _response_cache_key(self, endpoint: str, params: Dict[str, Any]) -> str:
+        """Disk cache key for a request; the API key is left out so rotating it keeps entries"""
+        items = sorted((k, v) for k, v in params.items() if k != "appid")
+        return hashlib.blake2b(f"{endpoint}|{items}".encode()).hexdigest()
+
     def _make_api_request(
         self, endpoint: str, params: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Make a generic API request with error handling"""
-        response = requests.get(f"{self.base_url}/{endpoint}", params=params)
-        data = response.json()
+        key = self._response_cache_key(endpoint, params)
+        data = self._disk_cache.get(key)
+        if data is not None:
+            return data
 
-        if response.status_code != 200:
-            raise Exception(f"API error: {data.get('message', 'Unknown error')}")
+        response = self._session.get(f"{self.base_url}/{endpoint}", params=params)
+        if not response.ok:
+            # A 404 means the location is unknown rather than a failed request
+            error = LookupError if response.status_code == 404 else Exception
+            raise error(f"API error {response.status_code}: {response.text[:256]}")
 
+        data = _json.loads(response.content)
+
+        self._disk_cache.set(key, data, expire=ttl_for(endpoint))
         return data
 
-    def _get_coordinates(self, location: str) -> Tuple[float, float]:
-        """Get coordinates for a location using the geocoding API"""
-        # Try different variations of the location name
-        location_variations = [
+    async def _amake_api_request(
+        self, endpoint: str, params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Async variant of _make_api_request"""
+        key = self._response_cache_key(endpoint, params)
+        data = self._disk_cache.get(key)
+        if data is not None:
+            return data
+
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            # A client left over from an earlier event loop (e.g. one asyncio.run
+            # per route_query call) is dropped, not awaited: its connections
+            # belong to that loop, and closing them here fails once it is closed
+            self._async_client = httpx.AsyncClient(
+                timeout=10, limits=httpx.Limits(max_connections=50)
+            )
+            self._async_client_loop = loop
+
+        response = await self._async_client.get(
+            f"{self.base_url}/{endpoint}", params=params
+        )
+        if not response.is_success:
+            # A 404 means the location is unknown rather than a failed request
+            error = LookupError if response.status_code == 404 else Exception
+            raise error(f"API error {response.status_code}: {response.text[:256]}")
+
+        data = _json.loads(response.content)
+
+        self._disk_cache.set(key, data, expire=ttl_for(endpoint))
+        return data
+
+    def close(self) -> None:
+        """Close the pooled HTTP session and the disk cache"""
+        self._session.close()
+        self._disk_cache.close()
+
+    def __enter__(self) -> "WeatherTool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
+
+    async def __aenter__(self) -> "WeatherTool":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def _location_variations(self, location: str) -> List[str]:
+        """Distinct spellings of a location to try against the geocoding API"""
+        variations = (
             location,  # Original location
             f"{location},PK",  # With country code
             f"{location},Pakistan",  # With full country name
             location.title(),  # Title case
             location.upper(),  # Upper case
+        )
+        # e.g. "KARACHI" is its own upper case; drop repeats but keep the order
+        return list(dict.fromkeys(variations))
+
+    def _cached_coordinates(self, location: str) -> Optional[Tuple[float, float]]:
+        """Return previously resolved coordinates for a location, if any"""
+        with self._cache_lock:
+            return self._geo_cache.get(location.strip().casefold())
+
+    def _store_coordinates(
+        self, location: str, coordinates: Tuple[float, float]
+    ) -> Tuple[float, float]:
+        """Remember resolved coordinates for a location and return them"""
+        with self._cache_lock:
+            self._geo_cache[location.strip().casefold()] = coordinates
+        return coordinates
+
+    def _coordinate_probe_stages(
+        self, location: str
+    ) -> List[List[Tuple[str, Dict[str, Any]]]]:
+        """Requests that can resolve a location, geocoding first, weather as fallback"""
+        location_variations = self._location_variations(location)
+        geocoding = [
+            ("geo/1.0/direct", {"q": loc, "appid": self.api_key, "limit": 1})
+            for loc in location_variations
         ]
+        weather = [
+            ("weather", {"q": loc, "appid": self.api_key})
+            for loc in location_variations
+        ]
+        with self._cache_lock:
+            return [
+                [
+                    (endpoint, params)
+                    for endpoint, params in stage
+                    if (endpoint, params["q"]) not in self._known_bad
+                ]
+                for stage in (geocoding, weather)
+            ]
 
-        for loc in location_variations:
-            try:
-                # Try direct geocoding first
-                params = {"q": loc, "appid": self.api_key, "limit": 1}
-                data = self._make_api_request("geo/1.0/direct", params)
+    def _mark_bad_probe(self, endpoint: str, params: Dict[str, Any]) -> None:
+        """Remember a probe that found no match so it is not sent again"""
+        with self._cache_lock:
+            self._known_bad.add((endpoint, params["q"]))
 
-                if data and len(data) > 0:
-                    return data[0]["lat"], data[0]["lon"]
-            except Exception:
-                continue
+    @staticmethod
+    def _parse_coordinates(endpoint: str, data: Any) -> Tuple[float, float]:
+        """Extract (lat, lon) from a geocoding or weather API payload"""
+        if endpoint == "weather":
+            return data["coord"]["lat"], data["coord"]["lon"]
+        if not data:
+            raise LookupError("No geocoding match")
+        return data[0]["lat"], data[0]["lon"]
 
-        # If all variations fail, try the weather API as fallback
-        for loc in location_variations:
-            try:
-                params = {"q": loc, "appid": self.api_key}
-                data = self._make_api_request("weather", params)
-                return data["coord"]["lat"], data["coord"]["lon"]
-            except Exception:
+    def _probe_coordinates(
+        self, endpoint: str, params: Dict[str, Any]
+    ) -> Tuple[float, float]:
+        try:
+            data = self._make_api_request(endpoint, params)
+            return self._parse_coordinates(endpoint, data)
+        except LookupError:
+            self._mark_bad_probe(endpoint, params)
+            raise
+
+    def _get_coordinates(self, location: str) -> Tuple[float, float]:
+        """Get coordinates for a location, probing a few spellings at a time"""
+        cached = self._cached_coordinates(location)
+        if cached is not None:
+            return cached
+
+        # The weather endpoint is only tried once every geocoding spelling missed
+        for probes in self._coordinate_probe_stages(location):
+            if not probes:
                 continue
+            executor = ThreadPoolExecutor(
+                max_workers=min(_PROBE_CONCURRENCY, len(probes))
+            )
+            queued = iter(probes)
+            try:
+                futures = [
+                    executor.submit(self._probe_coordinates, endpoint, params)
+                    for endpoint, params in islice(queued, _PROBE_CONCURRENCY)
+                ]
+                # Take results in preference order rather than completion order,
+                # so the same name always resolves to the same place
+                for future in futures:
+                    try:
+                        return self._store_coordinates(location, future.result())
+                    except Exception:
+                        for endpoint, params in islice(queued, 1):
+                            futures.append(
+                                executor.submit(
+                                    self._probe_coordinates, endpoint, params
+                                )
+                            )
+            finally:
+                # Return without waiting for the probe still in flight
+                executor.shutdown(wait=False)
 
         raise Exception(
             f"Could not find coordinates for {location}. Please check the location name and try again."
         )
 
-    def get_current_weather(self, location: str) -> WeatherData:
-        """Get current weather data for a specific location"""
-        params = {"q": location, "appid": self.api_key, "units": "metric"}
-        data = self._make_api_request("weather", params)
+    async def _aget_coordinates(self, location: str) -> Tuple[float, float]:
+        """Async variant of _get_coordinates"""
+        cached = self._cached_coordinates(location)
+        if cached is not None:
+            return cached
+
+        async def _probe(endpoint: str, params: Dict[str, Any]) -> Tuple[float, float]:
+            try:
+                data = await self._amake_api_request(endpoint, params)
+                return self._parse_coordinates(endpoint, data)
+            except LookupError:
+                self._mark_bad_probe(endpoint, params)
+                raise
+
+        for probes in self._coordinate_probe_stages(location):
+            queued = iter(probes)
+            tasks = [
+                asyncio.create_task(_probe(endpoint, params))
+                for endpoint, params in islice(queued, _PROBE_CONCURRENCY)
+            ]
+            try:
+                # Preference order and sliding window, as in _get_coordinates
+                for task in tasks:
+                    try:
+                        return self._store_coordinates(location, await task)
+                    except Exception:
+                        for endpoint, params in islice(queued, 1):
+                            tasks.append(asyncio.create_task(_probe(endpoint, params)))
+            finally:
+                for task in tasks:
+                    task.cancel()
 
+        raise Exception(
+            f"Could not find coordinates for {location}. Please check the location name and try again."
+        )
+
+    @staticmethod
+    def _parse_weather(data: Dict[str, Any], location: str) -> WeatherData:
+        """Build WeatherData from a current-weather API payload"""
         return WeatherData(
             temperature=data["main"]["temp"],
             feels_like=data["main"]["feels_like"],
@@ -90,6 +346,46 @@ class WeatherTool:
             location=location,
         )
 
+    @staticmethod
+    def _parse_air_quality(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract AQI and components from an air pollution API payload"""
+        return {
+            "aqi": data["list"][0]["main"]["aqi"],
+            "components": data["list"][0]["components"],
+        }
+
+    @cachedmethod(
+        operator.attrgetter("_current_cache"),
+        key=_location_key,
+        lock=operator.attrgetter("_cache_lock"),
+    )
+    def get_current_weather(self, location: str) -> WeatherData:
+        """Get current weather data for a specific location"""
+        params = {"q": location, "appid": self.api_key, "units": "metric"}
+        data = self._make_api_request("weather", params)
+        return self._parse_weather(data, location)
+
+    async def aget_current_weather(self, location: str) -> WeatherData:
+        """Async variant of get_current_weather, sharing its cache"""
+        key = _location_key(self, location)
+        with self._cache_lock:
+            cached = self._current_cache.get(key)
+        if cached is not None:
+            return cached
+
+        params = {"q": location, "appid": self.api_key, "units": "metric"}
+        data = await self._amake_api_request("weather", params)
+        weather = self._parse_weather(data, location)
+
+        with self._cache_lock:
+            self._current_cache[key] = weather
+        return weather
+
+    @cachedmethod(
+        operator.attrgetter("_forecast_cache"),
+        key=_location_key,
+        lock=operator.attrgetter("_cache_lock"),
+    )
     def get_weather_forecast(self, location: str, days: int = 5) -> List[WeatherData]:
         """Get weather forecast for the next few days"""
         lat, lon = self._get_coordinates(location)
@@ -104,72 +400,177 @@ class WeatherTool:
 
         data = self._make_api_request("forecast", params)
 
-        forecast = []
-        for item in data["list"]:
-            forecast.append(
-                WeatherData(
-                    temperature=item["main"]["temp"],
-                    feels_like=item["main"]["feels_like"],
-                    humidity=item["main"]["humidity"],
-                    wind_speed=item["wind"]["speed"],
-                    description=item["weather"][0]["description"],
-                    icon=item["weather"][0]["icon"],
-                    timestamp=datetime.fromtimestamp(item["dt"]),
-                    location=location,
-                )
+        _fts = datetime.fromtimestamp
+        return [
+            WeatherData(
+                temperature=main["temp"],
+                feels_like=main["feels_like"],
+                humidity=main["humidity"],
+                wind_speed=item["wind"]["speed"],
+                description=weather["description"],
+                icon=weather["icon"],
+                timestamp=_fts(item["dt"]),
+                location=location,
             )
+            for item in data["list"]
+            for main, weather in ((item["main"], item["weather"][0]),)
+        ]
 
-        return forecast
+    def get_daily_forecast(self, location: str, days: int = 5) -> List[Dict[str, Any]]:
+        """
+        Summarize the 3-hourly forecast into one record per local day. The first
+        and last days are usually partial; "samples" tells how many of a full
+        day's 8 readings each record is based on.
+        """
+        daily = []
+        for day, samples in groupby(
+            self.get_weather_forecast(location, days),
+            key=lambda sample: sample.timestamp.date(),
+        ):
+            samples = list(samples)
+            temperatures = [sample.temperature for sample in samples]
+            descriptions = Counter(sample.description for sample in samples)
+            daily.append(
+                {
+                    "date": day.isoformat(),
+                    "samples": len(samples),
+                    "temp_min": min(temperatures),
+                    "temp_max": max(temperatures),
+                    "humidity": round(
+                        sum(sample.humidity for sample in samples) / len(samples)
+                    ),
+                    "wind_speed": max(sample.wind_speed for sample in samples),
+                    "description": descriptions.most_common(1)[0][0],
+                }
+            )
+        return daily
 
+    @cachedmethod(
+        operator.attrgetter("_air_quality_cache"),
+        key=_location_key,
+        lock=operator.attrgetter("_cache_lock"),
+    )
     def get_air_quality(self, location: str) -> Dict[str, Any]:
         """Get air quality data for a location"""
         lat, lon = self._get_coordinates(location)
 
         params = {"lat": lat, "lon": lon, "appid": self.api_key}
         data = self._make_api_request("air_pollution", params)
+        return self._parse_air_quality(data)
 
-        return {
-            "aqi": data["list"][0]["main"]["aqi"],
-            "components": data["list"][0]["components"],
-        }
+    async def aget_air_quality(self, location: str) -> Dict[str, Any]:
+        """Async variant of get_air_quality, sharing its cache"""
+        key = _location_key(self, location)
+        with self._cache_lock:
+            cached = self._air_quality_cache.get(key)
+        if cached is not None:
+            return cached
+
+        lat, lon = await self._aget_coordinates(location)
+        params = {"lat": lat, "lon": lon, "appid": self.api_key}
+        data = await self._amake_api_request("air_pollution", params)
+        air_quality = self._parse_air_quality(data)
+
+        with self._cache_lock:
+            self._air_quality_cache[key] = air_quality
+        return air_quality
 
+    @cachedmethod(
+        operator.attrgetter("_uv_cache"), lock=operator.attrgetter("_cache_lock")
+    )
     def get_uv_index(self, lat: float, lon: float) -> float:
         """Get UV index for specific coordinates"""
         params = {"lat": lat, "lon": lon, "appid": self.api_key}
         data = self._make_api_request("uvi", params)
         return data["value"]
 
-    def get_historical_air_quality(
-        self, location: str, days: int = 7
-    ) -> List[Dict[str, Any]]:
-        """Get historical air quality data for a location"""
+    @staticmethod
+    def _result_or_none(future: Future) -> Any:
+        """Result of a supplementary lookup, or None if it failed"""
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def get_bundle(self, location: str) -> Dict[str, Any]:
+        """
+        Fetch current weather, air quality and UV index in parallel. A failed UV
+        lookup (the legacy uvi endpoint is the least reliable) leaves None.
+        """
+        # Resolve once up front so every call below reuses the cached coordinates
         lat, lon = self._get_coordinates(location)
 
-        historical_data = []
-        for i in range(days):
-            timestamp = int((datetime.now() - timedelta(days=i)).timestamp())
-
-            params = {
-                "lat": lat,
-                "lon": lon,
-                "appid": self.api_key,
-                "start": timestamp,
-                "end": timestamp,
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            current = executor.submit(self.get_current_weather, location)
+            air_quality = executor.submit(self.get_air_quality, location)
+            uv_index = executor.submit(self.get_uv_index, lat, lon)
+
+            uv_value = self._result_or_none(uv_index)
+            return {
+                "current": replace(current.result(), uv_index=uv_value),
+                "air_quality": air_quality.result(),
+                "uv_index": uv_value,
             }
 
-            try:
-                data = self._make_api_request("air_pollution/history", params)
-                if data["list"]:
-                    historical_data.append(
-                        {
-                            "date": datetime.fromtimestamp(timestamp).strftime(
-                                "%Y-%m-%d"
-                            ),
-                            "aqi": data["list"][0]["main"]["aqi"],
-                            "components": data["list"][0]["components"],
-                        }
-                    )
-            except Exception:
-                continue
+    def _history_params(self, lat: float, lon: float, days: int) -> Dict[str, Any]:
+        """Parameters for a single air_pollution/history request over the past days"""
+        # Whole hours keep the request (and its disk cache key) stable within an hour
+        end = int(datetime.now().timestamp()) // 3600 * 3600
+        return {
+            "lat": lat,
+            "lon": lon,
+            "appid": self.api_key,
+            "start": end - days * 24 * 60 * 60,
+            "end": end,
+        }
+
+    @staticmethod
+    def _aggregate_daily_air_quality(
+        data: Dict[str, Any], days: int
+    ) -> List[Dict[str, Any]]:
+        """Average hourly air quality samples per day, most recent day first"""
+        # Group on local date objects and format each day's label only once
+        _local_date = date.fromtimestamp
+        by_day = groupby(
+            sorted(data["list"], key=operator.itemgetter("dt"), reverse=True),
+            key=lambda s: _local_date(s["dt"]),
+        )
+
+        historical_data = []
+        for day, samples in islice(by_day, days):
+            samples = list(samples)
+            count = len(samples)
+            components: Dict[str, float] = {}
+            for sample in samples:
+                for name, value in sample["components"].items():
+                    components[name] = components.get(name, 0) + value
+            historical_data.append(
+                {
+                    "date": day.isoformat(),
+                    "aqi": round(sum(s["main"]["aqi"] for s in samples) / count, 2),
+                    "components": {
+                        name: round(total / count, 2)
+                        for name, total in components.items()
+                    },
+                }
+            )
 
         return historical_data
+
+    def get_historical_air_quality(
+        self, location: str, days: int = 7
+    ) -> List[Dict[str, Any]]:
+        """Get daily average air quality for a location over the past days"""
+        lat, lon = self._get_coordinates(location)
+        params = self._history_params(lat, lon, days)
+        data = self._make_api_request("air_pollution/history", params)
+        return self._aggregate_daily_air_quality(data, days)
+
+    async def aget_historical_air_quality(
+        self, location: str, days: int = 7
+    ) -> List[Dict[str, Any]]:
+        """Async variant of get_historical_air_quality"""
+        lat, lon = await self._aget_coordinates(location)
+        params = self._history_params(lat, lon, days)
+        data = await self._amake_api_request("air_pollution/history", params)
+        return self._aggregate_daily_air_quality(data, days)
@@ -1,9 +1,12 @@
+import functools
+
 from langchain_community.tools.tavily_search.tool import TavilySearchResults
 
 
+@functools.lru_cache(maxsize=1)
 def get_web_search_tool():
     """
-    Returns the Tavily web search tool, allowing agents to search the web.
+    Returns the shared Tavily web search tool, allowing agents to search the web.
     Make sure TAVILY_API_KEY is set in environment variables.
     """
     return TavilySearchResults()
@@ -3,37 +3,65 @@ from colorama import Fore, Style, init
 # Initialize colorama once
 init(autoreset=True)
 
+# Colorized strings are built once here rather than on every call
+_USER_PREFIX = f"{Fore.GREEN}{Style.BRIGHT}User:{Style.RESET_ALL} "
+_AGENT_PREFIX = f"{Fore.CYAN}{Style.BRIGHT}Agent:{Style.RESET_ALL} "
+_DIVIDER = f"{Fore.YELLOW}{'-'*60}{Style.RESET_ALL}"
+_INTRO = (
+    f"\n{Fore.MAGENTA}{Style.BRIGHT}🌐 LangChain CLI Assistant (Web + Weather Agent){Style.RESET_ALL}\n"
+    "Type your question or type 'exit' to quit.\n\n"
+    f"{_DIVIDER}"
+)
+_EXIT = f"\n{Fore.BLUE}👋 Exiting... Goodbye!"
+_THINKING = f"{Fore.YELLOW}🔎 Thinking...\n"
+_WELCOME_LINES = (
+    "Welcome to the Advanced Weather Assistant!",
+    "\nI can help you with:",
+    "- Current weather conditions",
+    "- Weather forecasts",
+    "- Air quality information",
+    "- UV index data",
+    "- Personalized weather recommendations",
+    "- Travel impact analysis",
+    "\nType 'help' for more information or 'exit' to quit",
+)
+_WELCOME = "\n".join(_WELCOME_LINES)
+
 
 class FormatCLI:
     """This class is responsible for formatting CLI"""
 
     @staticmethod
     def format_user_input(prompt: str) -> str:
-        return f"{Fore.GREEN}{Style.BRIGHT}User:{Style.RESET_ALL} {prompt}"
+        return _USER_PREFIX + prompt
 
     @staticmethod
     def format_agent_output(response: str) -> str:
-        return f"{Fore.CYAN}{Style.BRIGHT}Agent:{Style.RESET_ALL} {response}"
+        return _AGENT_PREFIX + response
+
+    @staticmethod
+    def format_divider() -> str:
+        return _DIVIDER
 
     @staticmethod
     def print_divider():
-        print(f"{Fore.YELLOW}{'-'*60}{Style.RESET_ALL}")
+        print(_DIVIDER)
 
     @staticmethod
     def print_intro():
-        print(
-            f"\n{Fore.MAGENTA}{Style.BRIGHT}🌐 LangChain CLI Assistant (Web + Weather Agent){Style.RESET_ALL}"
-        )
-        print("Type your question or type 'exit' to quit.\n")
-        FormatCLI.print_divider()
+        print(_INTRO)
 
     @staticmethod
     def print_exit():
-        print(f"\n{Fore.BLUE}👋 Exiting... Goodbye!")
+        print(_EXIT)
 
     @staticmethod
     def print_thinking():
-        print(f"{Fore.YELLOW}🔎 Thinking...\n")
+        print(_THINKING)
+
+    @staticmethod
+    def print_status(status: str):
+        print(f"{Fore.YELLOW}{status}")
 
     @staticmethod
     def print_error(error: str):
@@ -42,15 +70,7 @@ class FormatCLI:
     @staticmethod
     def _print_welcome_message() -> None:
         """Print the welcome message and available features"""
-        print("Welcome to the Advanced Weather Assistant!")
-        print("\nI can help you with:")
-        print("- Current weather conditions")
-        print("- Weather forecasts")
-        print("- Air quality information")
-        print("- UV index data")
-        print("- Personalized weather recommendations")
-        print("- Travel impact analysis")
-        print("\nType 'help' for more information or 'exit' to quit")
+        print(_WELCOME)
 
 
 formatCLI = FormatCLI()
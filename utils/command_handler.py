@@ -4,11 +4,24 @@ from agents.weather_agent import WeatherAgent
 
 
 class CommandHandler:
+    _HELP_TEXT = """
+        Available commands:
+        - 'weather [location]' (or 'wx') - Get current weather
+        - 'forecast [location] [days]' (or 'fc') - Get weather forecast (default 3 days)
+        - 'air [location]' - Get air quality information
+        - 'recommend [location]' - Get personalized recommendations
+        - 'travel [location]' - Get travel impact analysis
+        - 'help' - Show this help message
+        - 'exit' or 'quit' - Exit the program
+        """
+
     def __init__(self, weather_agent: WeatherAgent):
         self.weather_agent = weather_agent
         self.commands: Dict[str, Callable] = {
             "weather": self._handle_weather,
+            "wx": self._handle_weather,
             "forecast": self._handle_forecast,
+            "fc": self._handle_forecast,
             "air": self._handle_air,
             "recommend": self._handle_recommend,
             "travel": self._handle_travel,
@@ -17,12 +30,16 @@ class CommandHandler:
 
     def handle_command(self, command: str, args: list) -> str:
         """Handle the given command with its arguments"""
-        if command not in self.commands:
-            # If command is not recognized, treat the entire input as a query
-            query = f"{command} {' '.join(args)}".strip()
-            return self.weather_agent.invoke(query)
+        handler = self.commands.get(command.lower())
+        try:
+            if handler is None:
+                # If command is not recognized, treat the entire input as a query
+                query = f"{command} {' '.join(args)}".strip()
+                return self.weather_agent.invoke(query)
 
-        return self.commands[command](args)
+            return handler(args)
+        except Exception as e:
+            return f"Sorry, I encountered an error: {str(e)}. Please try rephrasing your question."
 
     def _handle_weather(self, args: list) -> str:
         """Handle weather command"""
@@ -68,14 +85,4 @@ class CommandHandler:
 
     def _handle_help(self, args: list) -> str:
         """Handle help command"""
-        help_text = """
-        Available commands:
-        - 'weather [location]' - Get current weather
-        - 'forecast [location] [days]' - Get weather forecast (default 3 days)
-        - 'air [location]' - Get air quality information
-        - 'recommend [location]' - Get personalized recommendations
-        - 'travel [location]' - Get travel impact analysis
-        - 'help' - Show this help message
-        - 'exit' or 'quit' - Exit the program
-        """
-        return help_text
+        return self._HELP_TEXT
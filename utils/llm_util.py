@@ -1,14 +1,23 @@
+import functools
+
 from langchain_openai import OpenAI
 
 from config.config import config
 
 
 class LLM_UTIL:
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
     def get_llm():
         """
         This function is responsible for all communication with the OPENAI.
+        The client is created once and shared, keeping its connection pool warm.
         """
 
+        # Streaming lets callers surface tokens as they arrive; non-streaming
+        # callers still receive the aggregated completion
         return OpenAI(
-            temperature=config.TEMPERATURE, openai_api_key=config.OPENAI_API_KEY
+            temperature=config.TEMPERATURE,
+            openai_api_key=config.OPENAI_API_KEY,
+            streaming=True,
         )
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class ResponseCache:
+    """
+    Two-tier cache for final agent responses.
+
+    Exact hits are looked up by the normalized query. On a miss the query is
+    embedded with a small local sentence-transformers model (if installed) and
+    compared against the embeddings of the cached queries; a cosine similarity
+    above sim_threshold is served as a hit. Entries only ever match queries
+    with the same scope, so "weather in Lahore" never answers "weather in Karachi".
+
+    Async callers should use aget/aset, which load the model and compute
+    embeddings on a worker thread instead of blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600,
+        sim_threshold: float = 0.92,
+        maxsize: int = 256,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+    ):
+        self.ttl = ttl
+        self.sim_threshold = sim_threshold
+        self.maxsize = maxsize
+        self.model_name = model_name
+        # (scope, normalized query) -> (expires_at, response, embedding)
+        self._entries: Dict[Tuple[str, str], Tuple[float, str, Any]] = {}
+        # Embeddings computed by a missed get(), reused by the following set()
+        self._pending: Dict[Tuple[str, str], Any] = {}
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._semantic_enabled = True
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return _WHITESPACE_RE.sub(" ", query.strip().lower()).rstrip("?!. ")
+
+    def _embed(self, text: str):
+        """Return a unit-length embedding, or None if no model is available"""
+        if not self._semantic_enabled:
+            return None
+        with self._model_lock:
+            if self._model is None and self._semantic_enabled:
+                self._model = self._load_model()
+        if self._model is None:
+            return None
+        return self._model.encode(text, normalize_embeddings=True)
+
+    def _load_model(self):
+        """Load the embedding model, disabling the semantic tier if that fails"""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.info(
+                "sentence-transformers not installed, using exact-match cache only"
+            )
+            self._semantic_enabled = False
+            return None
+        try:
+            return SentenceTransformer(self.model_name)
+        except Exception as e:
+            # e.g. offline without a local copy of the model; don't retry per query
+            logger.warning(
+                "Could not load %s, using exact-match cache only: %s",
+                self.model_name,
+                e,
+            )
+            self._semantic_enabled = False
+            return None
+
+    def _get_exact(self, key: Tuple[str, str], now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                return entry[1]
+            del self._entries[key]
+        return None
+
+    def _get_similar(
+        self, key: Tuple[str, str], embedding, now: float
+    ) -> Optional[str]:
+        """Best unexpired same-scope response above the similarity threshold"""
+        if len(self._pending) >= self.maxsize:
+            self._pending.clear()
+        self._pending[key] = embedding
+
+        scope = key[0]
+        best_score, best_response = 0.0, None
+        for (entry_scope, _), (expires_at, response, cached) in self._entries.items():
+            if entry_scope != scope or cached is None or expires_at <= now:
+                continue
+            score = float(embedding @ cached)
+            if score > best_score:
+                best_score, best_response = score, response
+
+        if best_score >= self.sim_threshold:
+            logger.info("Semantic cache hit (similarity %.3f)", best_score)
+            return best_response
+        return None
+
+    def get(self, query: str, scope: str = "") -> Optional[str]:
+        """Return a cached response for the query, or None on a miss"""
+        key = (scope, self._normalize(query))
+        response = self._get_exact(key, time.monotonic())
+        if response is not None:
+            return response
+
+        embedding = self._embed(key[1])
+        if embedding is None:
+            return None
+        return self._get_similar(key, embedding, time.monotonic())
+
+    async def aget(self, query: str, scope: str = "") -> Optional[str]:
+        """Async variant of get that embeds the query off the event loop"""
+        key = (scope, self._normalize(query))
+        response = self._get_exact(key, time.monotonic())
+        if response is not None:
+            return response
+
+        embedding = await asyncio.to_thread(self._embed, key[1])
+        if embedding is None:
+            return None
+        return self._get_similar(key, embedding, time.monotonic())
+
+    def _store(
+        self, key: Tuple[str, str], response: str, embedding, ttl: Optional[float]
+    ) -> None:
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.maxsize:
+            # Evict the oldest insertion
+            del self._entries[next(iter(self._entries))]
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, response, embedding)
+
+    def set(
+        self, query: str, response: str, scope: str = "", ttl: Optional[float] = None
+    ) -> None:
+        """Store a response, optionally with a shorter TTL than the default"""
+        key = (scope, self._normalize(query))
+        embedding = self._pending.pop(key, None)
+        if embedding is None:
+            embedding = self._embed(key[1])
+        self._store(key, response, embedding, ttl)
+
+    async def aset(
+        self, query: str, response: str, scope: str = "", ttl: Optional[float] = None
+    ) -> None:
+        """Async variant of set that embeds the query off the event loop"""
+        key = (scope, self._normalize(query))
+        embedding = self._pending.pop(key, None)
+        if embedding is None:
+            embedding = await asyncio.to_thread(self._embed, key[1])
+        self._store(key, response, embedding, ttl)